@@ -5,12 +5,13 @@ Final integration test for Google Sheets with the specific user data.
 
 import os
 import sys
-import pandas as pd
 
 # Add the app directory to Python path
 sys.path.append(os.path.dirname(__file__))
 
 from google_api import read_google_sheet_public, extract_sheet_id_from_url
+# Build the frame exactly as the app does, rather than with a copy of its typing rules
+from frames import sheet_values_to_frame, optimize_dtypes
 
 def test_user_sheet():
     """Test with the specific user's Google Sheet data."""
@@ -42,16 +43,11 @@ def test_user_sheet():
     try:
         values = read_google_sheet_public(sheet_id, range_name, api_key)
         
-        
         if values and len(values) > 0:
             print(f"✅ Successfully loaded {len(values)} rows!")
             
-            # Create DataFrame
-            headers = values[0]
-            data_rows = values[1:] if len(values) > 1 else []
-            
-            if data_rows:
-                df = pd.DataFrame(data_rows, columns=headers)
+            if len(values) > 1:
+                df = optimize_dtypes(sheet_values_to_frame(values))
                 
                 print(f"\n📊 Data Summary:")
                 print(f"   Columns: {len(df.columns)}")
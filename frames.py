@@ -0,0 +1,73 @@
+"""DataFrame construction shared by the app and the integration script; no Streamlit imports."""
+from typing import Any, List
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Cells that parse as numbers but must stay text: leading zeros (ZIP codes, phone numbers,
+# SKUs) lose digits, and nan/inf literals would turn into NaN/inf
+SHEET_TEXT_ONLY_RE = r'^[+-]?(0[0-9]|nan$|inf(inity)?$)'
+SHEET_INTEGER_RE = r'^[+-]?[0-9]+$'
+
+def numeric_sheet_column(array):
+    """Cast a Sheets text column to int64/float64 when every non-empty cell parses, else return it unchanged."""
+    # Blank cells arrive as "" and should not block the cast
+    values = pc.if_else(pc.equal(array, ""), pa.scalar(None, pa.string()), array)
+    if values.null_count == len(values):
+        return array
+    if pc.any(pc.match_substring_regex(values, SHEET_TEXT_ONLY_RE, ignore_case=True)).as_py():
+        return array
+    try:
+        return pc.cast(values, pa.int64())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        pass
+    if pc.all(pc.match_substring_regex(values, SHEET_INTEGER_RE)).as_py():
+        # Integers beyond int64 (long IDs) would be rounded by a float cast
+        return array
+    try:
+        return pc.cast(values, pa.float64())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return array
+
+def sheet_values_to_frame(values: List[List[Any]]) -> pd.DataFrame:
+    """Build a frame from Sheets rows (first row = headers) column by column."""
+    headers, rows = values[0], values[1:]
+    width = len(headers)
+    # Sheets omits trailing empty cells, so pad (or trim) each row to the header width
+    columns = list(zip(*(row[:width] + [None] * (width - len(row)) for row in rows))) if rows else [()] * width
+    if PYARROW_AVAILABLE:
+        try:
+            table = pa.Table.from_arrays(
+                [numeric_sheet_column(pa.array(column, type=pa.string())) for column in columns],
+                names=[str(header) for header in headers]
+            )
+            # Keep strings in Arrow memory instead of re-materializing Python str objects
+            return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Non-string cells (e.g. from the service fallback): let pandas infer
+            pass
+    return pd.DataFrame({i: list(column) for i, column in enumerate(columns)}).set_axis(headers, axis=1)
+
+def optimize_dtypes(data: pd.DataFrame) -> pd.DataFrame:
+    """Shrink a freshly loaded frame: downcast integers, dictionary-encode repetitive text, Arrow-back the rest."""
+    # Columns are addressed by position so duplicate headers (common in Sheets) are handled too
+    for i in range(data.shape[1]):
+        series = data.iloc[:, i]
+        if pd.api.types.is_integer_dtype(series) and isinstance(series.dtype, np.dtype):
+            data.isetitem(i, pd.to_numeric(series, downcast='integer'))
+        elif series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+            # Leave mixed-type object columns alone
+            if not pd.api.types.is_string_dtype(series):
+                continue
+            if series.nunique(dropna=True) < 0.5 * len(series):
+                data.isetitem(i, series.astype('category'))
+            elif PYARROW_AVAILABLE and series.dtype == object:
+                data.isetitem(i, series.astype('string[pyarrow]'))
+    return data
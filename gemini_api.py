@@ -1,50 +1,97 @@
-import google.generativeai as genai
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import pandas as pd
 
-def configure_gemini(api_key):
-    genai.configure(api_key=api_key)
+MODEL_NAMES = [
+    'gemini-1.5-flash',
+    'gemini-1.5-pro',
+    'gemini-pro',
+    'models/gemini-1.5-flash',
+    'models/gemini-1.5-pro',
+    'models/gemini-pro'
+]
 
-def query_gemini(query, api_key, data=None):
+# One candidate with a bounded answer length keeps generation latency predictable
+GENERATION_CONFIG = {"candidate_count": 1, "max_output_tokens": 1024}
+
+# Client-side limits so rapid reruns queue briefly instead of tripping the free tier's 429s:
+# at most GEMINI_MAX_CONCURRENCY calls in flight, GEMINI_RPM call starts per minute (bursts
+# up to that many), and retryable failures retried after each of GEMINI_RETRY_DELAYS seconds
+GEMINI_MAX_CONCURRENCY = 2
+GEMINI_RPM = 15
+GEMINI_RETRY_DELAYS = (0.5, 1.0, 2.0)
+# google.api_core exception names for 429, 5xx and timeouts; matched by name so the
+# google packages stay unimported until the first model build
+RETRYABLE_ERRORS = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+                    "InternalServerError", "DeadlineExceeded"}
+
+_gemini_slots = threading.Semaphore(GEMINI_MAX_CONCURRENCY)
+_rate_lock = threading.Lock()
+_rate_tokens = float(GEMINI_RPM)
+_rate_updated = time.monotonic()
+
+# Persistent prompt -> response cache so reruns and retries skip the API call
+LLM_CACHE_PATH = os.path.join(os.path.dirname(__file__), ".llm_cache.sqlite3")
+LLM_CACHE_TTL = 24 * 60 * 60
+
+_cache_conn = None
+_cache_lock = threading.Lock()
+
+def _cache_connection():
+    """Open the cache database and create its table once; callers hold _cache_lock."""
+    global _cache_conn
+    if _cache_conn is None:
+        # Shared by Streamlit's script threads, serialized by _cache_lock
+        conn = sqlite3.connect(LLM_CACHE_PATH, check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        _cache_conn = conn
+    return _cache_conn
+
+def prompt_cache_key(model_name, prompt):
+    """Content-addressed key for a (model, prompt) pair."""
+    payload = json.dumps({"m": model_name, "prompt": prompt}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get_cached_response(key):
+    """Return a cached response younger than LLM_CACHE_TTL, or None."""
     try:
-        configure_gemini(api_key)
-        
-        model_names = [
-            'gemini-1.5-flash',
-            'gemini-1.5-pro', 
-            'gemini-pro',
-            'models/gemini-1.5-flash',
-            'models/gemini-1.5-pro',
-            'models/gemini-pro'
-        ]
-        
-        model = None
-        for model_name in model_names:
-            try:
-                model = genai.GenerativeModel(model_name)
-                break
-            except Exception:
-                continue
-        
-        if model is None:
-            try:
-                available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-                if available_models:
-                    model = genai.GenerativeModel(available_models[0])
-                else:
-                    return "Error: No suitable Gemini models available for content generation."
-            except Exception as e:
-                return f"Error: Could not access Gemini models. {str(e)}"
-        
-        if data is not None:
-            data_analysis = analyze_dataset_automatically(data)
-            
-            prompt = f"""You are an expert data analyst with advanced natural language understanding. 
-Your task is to understand user queries about any dataset and provide accurate, actionable responses.
+        with _cache_lock:
+            row = _cache_connection().execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+    except sqlite3.Error:
+        return None
+    if row and time.time() - row[1] < LLM_CACHE_TTL:
+        return row[0]
+    return None
 
-DATASET ANALYSIS:
-{data_analysis}
+def store_cached_response(key, response):
+    """Store a response and delete the ones past LLM_CACHE_TTL so the file stays bounded."""
+    now = time.time()
+    try:
+        with _cache_lock, _cache_connection() as conn:
+            conn.execute("DELETE FROM responses WHERE created < ?", (now - LLM_CACHE_TTL,))
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created) VALUES (?, ?, ?)",
+                (key, response, now),
+            )
+    except sqlite3.Error:
+        pass
 
-USER QUERY: "{query}"
+DATA_ANALYST_INSTRUCTIONS = """You are an expert data analyst with advanced natural language understanding. 
+Your task is to understand user queries about any dataset and provide accurate, actionable responses.
+The dataset analysis and the user query follow these instructions; sample rows are CSV-encoded with a header line.
 
 INSTRUCTIONS:
 1. Analyze the user's query to understand their intent (filtering, counting, analysis, etc.)
@@ -66,12 +113,125 @@ RESPONSE FORMAT:
 - Explain your analysis process
 - If applicable, mention the number of matching records
 - Be specific about which columns and values you used"""
-        else:
-            prompt = f"""You are a helpful AI assistant. Please respond to this query: {query}"""
+
+@lru_cache(maxsize=None)
+def _genai():
+    """Import google.generativeai on first use; it is slow to import and CSV-only sessions never need it."""
+    import google.generativeai as genai
+    return genai
+
+_configured_key_hash = None
+
+def api_key_hash(api_key):
+    return hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()
+
+def configure_gemini(api_key):
+    """Point the global genai client at api_key; a no-op when it already is."""
+    global _configured_key_hash
+    key_hash = api_key_hash(api_key)
+    if key_hash != _configured_key_hash:
+        _genai().configure(api_key=api_key)
+        _configured_key_hash = key_hash
+
+def get_gemini_model(api_key):
+    """Return the first usable Gemini model for api_key, probing once per key.
+
+    genai configuration is process-global, so it is re-applied whenever the
+    key changes even if the model itself comes from the cache.
+    """
+    configure_gemini(api_key)
+    return _resolve_model(api_key_hash(api_key), os.getenv("GEMINI_MODEL"))
+
+@lru_cache(maxsize=8)
+def _resolve_model(key_hash, pinned_model=None):
+    # key_hash only partitions the cache; the client is already configured for it.
+    # Failures raise instead of returning None so they are not cached.
+    if pinned_model:
+        # Deployments that know their model skip the probe and list_models() entirely
+        return _genai().GenerativeModel(pinned_model)
+
+    for model_name in MODEL_NAMES:
+        try:
+            return _genai().GenerativeModel(model_name)
+        except Exception:
+            continue
+
+    available_models = [m.name for m in _genai().list_models() if 'generateContent' in m.supported_generation_methods]
+    if not available_models:
+        raise LookupError("No suitable Gemini models available for content generation.")
+    return _genai().GenerativeModel(available_models[0])
+
+# Whole-query match for questions about the dataset's structure rather than its values
+STRUCTURAL_QUERY_RE = re.compile(
+    r"^\W*(?:"
+    r"(?:list|show|what are|name|describe)(?: me)?(?: all)?(?: the)?"
+    r" (?:columns|column names|fields|headers|schema|data ?types|dtypes)"
+    r"|how many (?:rows|columns)(?: are there)?(?: in (?:the|this) (?:data|dataset|file))?"
+    r")\W*$",
+    re.IGNORECASE
+)
+
+def normalize_query(query):
+    """Case-fold, collapse whitespace and drop trailing punctuation for cache lookups."""
+    return " ".join(str(query).casefold().split()).rstrip("?.! ")
+
+def build_prompt(query, data_analysis=None):
+    if data_analysis is not None:
+        # Static instructions first, dynamic dataset/query last, so the
+        # provider can reuse the cached prompt prefix across requests.
+        return f"""{DATA_ANALYST_INSTRUCTIONS}
+
+DATASET ANALYSIS:
+{data_analysis}
+
+USER QUERY: "{query}\""""
+    return f"""You are a helpful AI assistant. Please respond to this query: {query}"""
+
+def _acquire_rate_token():
+    """Take one call start from the token bucket, sleeping until it refills if empty."""
+    global _rate_tokens, _rate_updated
+    with _rate_lock:
+        now = time.monotonic()
+        _rate_tokens = min(float(GEMINI_RPM), _rate_tokens + (now - _rate_updated) * GEMINI_RPM / 60.0)
+        _rate_updated = now
+        # Going negative reserves a later slot, so concurrent waiters queue in order
+        _rate_tokens -= 1.0
+        wait = -_rate_tokens * 60.0 / GEMINI_RPM if _rate_tokens < 0 else 0.0
+    if wait:
+        time.sleep(wait)
+
+def _is_retryable(error):
+    return type(error).__name__ in RETRYABLE_ERRORS or isinstance(error, (ConnectionError, TimeoutError))
+
+def _call_model(model, prompt):
+    """generate_content under the client-side limits, with backoff on 429s and transient errors."""
+    for delay in GEMINI_RETRY_DELAYS + (None,):
+        _acquire_rate_token()
+        try:
+            with _gemini_slots:
+                return model.generate_content(prompt, generation_config=GENERATION_CONFIG)
+        except Exception as e:
+            if delay is None or not _is_retryable(e):
+                raise
+        time.sleep(delay)
+
+def _generate(model, query, data_analysis):
+    """Answer one query from the response cache or the model."""
+    try:
+        prompt = build_prompt(query, data_analysis)
+        
+        # Key on the normalized query so repeats differing only in case or spacing share an entry
+        cache_key = prompt_cache_key(
+            getattr(model, "model_name", ""), build_prompt(normalize_query(query), data_analysis)
+        )
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            return cached
         
-        response = model.generate_content(prompt)
+        response = _call_model(model, prompt)
         
         if response.text:
+            store_cached_response(cache_key, response.text)
             return response.text
         else:
             return "No response generated from Gemini."
@@ -79,41 +239,152 @@ RESPONSE FORMAT:
     except Exception as e:
         return f"Error querying Gemini: {str(e)}"
 
-def analyze_dataset_automatically(data):
+def _load_model(api_key):
+    """Return (model, None), or (None, error message) when no model is usable."""
+    try:
+        return get_gemini_model(api_key), None
+    except LookupError as e:
+        return None, f"Error: {str(e)}"
+    except Exception as e:
+        return None, f"Error: Could not access Gemini models. {str(e)}"
+
+def query_gemini(query, api_key, data=None):
+    try:
+        model, error = _load_model(api_key)
+        if error:
+            return error
+        
+        data_analysis = None
+        if data is not None:
+            # Structural questions only need the schema, not values or sample rows
+            schema_only = bool(STRUCTURAL_QUERY_RE.search(query))
+            data_analysis = get_dataset_analysis(data, schema_only=schema_only)
+        return _generate(model, query, data_analysis)
+            
+    except Exception as e:
+        return f"Error querying Gemini: {str(e)}"
+
+def query_gemini_batch(queries, api_key, data=None):
+    """Answer several queries about the same data, in query order.
+
+    The dataset analysis is built once per variant (full or schema-only)
+    and the model calls run concurrently.
+    """
+    if not queries:
+        return []
+    
+    model, error = _load_model(api_key)
+    if error:
+        return [error] * len(queries)
+    
+    try:
+        analyses = {}
+        query_analyses = []
+        for query in queries:
+            data_analysis = None
+            if data is not None:
+                schema_only = bool(STRUCTURAL_QUERY_RE.search(query))
+                if schema_only not in analyses:
+                    analyses[schema_only] = get_dataset_analysis(data, schema_only=schema_only)
+                data_analysis = analyses[schema_only]
+            query_analyses.append(data_analysis)
+    except Exception as e:
+        return [f"Error querying Gemini: {str(e)}"] * len(queries)
+    
+    with ThreadPoolExecutor(max_workers=min(8, len(queries))) as executor:
+        return list(executor.map(lambda args: _generate(model, *args), zip(queries, query_analyses)))
+
+# Dataset analyses keyed by content fingerprint, so repeat queries on an unchanged frame skip the scan
+ANALYSIS_CACHE_SIZE = 8
+_analysis_cache: dict = {}
+_analysis_lock = threading.Lock()
+
+def dataset_fingerprint(data):
+    """Content hash of a DataFrame (values, index, columns, dtypes), or None if it has unhashable cells."""
+    try:
+        row_hashes = pd.util.hash_pandas_object(data, index=True).to_numpy()
+    except TypeError:
+        return None
+    digest = hashlib.sha256(row_hashes.tobytes())
+    digest.update(repr((data.shape, [str(c) for c in data.columns], [str(t) for t in data.dtypes])).encode("utf-8"))
+    return digest.hexdigest()
+
+def get_dataset_analysis(data, schema_only=False):
+    """analyze_dataset_automatically, memoized per dataset content."""
+    fingerprint = dataset_fingerprint(data)
+    if fingerprint is None:
+        return analyze_dataset_automatically(data, schema_only=schema_only)
+    
+    key = (fingerprint, schema_only)
+    with _analysis_lock:
+        analysis = _analysis_cache.get(key)
+    if analysis is not None:
+        return analysis
+    
+    # Analyze outside the lock; concurrent sessions at worst compute the same summary twice
+    analysis = analyze_dataset_automatically(data, schema_only=schema_only)
+    with _analysis_lock:
+        if key not in _analysis_cache and len(_analysis_cache) >= ANALYSIS_CACHE_SIZE:
+            # Evict the oldest entry
+            _analysis_cache.pop(next(iter(_analysis_cache)))
+        _analysis_cache[key] = analysis
+    return analysis
+
+def distinct_values(series, limit, unique_count=None):
+    """First `limit` distinct non-null values in order of appearance, as plain Python objects.
+
+    Scans a growing prefix of the column and stops as soon as enough values
+    (or all `unique_count` of them) have been seen, instead of hashing every row.
+    """
+    wanted = limit if unique_count is None else min(limit, unique_count)
+    prefix = 1024
+    while True:
+        values = series.iloc[:prefix].dropna().unique()
+        if len(values) >= wanted or prefix >= len(series):
+            return values[:limit].tolist()
+        prefix *= 4
+
+def analyze_dataset_automatically(data, schema_only=False):
+    """Summarize a DataFrame for the prompt; schema_only skips value listings and sample rows."""
     analysis = []
     
     analysis.append(f"Dataset Shape: {data.shape[0]} rows, {data.shape[1]} columns")
-    analysis.append(f"Column Names: {', '.join(data.columns)}")
+    analysis.append(f"Column Names: {', '.join(map(str, data.columns))}")
+    
+    # Types, null and unique counts in whole-frame passes up front. Columns are addressed
+    # by position so duplicate and non-string names work too
+    dtypes = data.dtypes.astype(str).tolist()
+    null_counts = data.isna().sum().tolist()
+    if not schema_only:
+        unique_counts = data.nunique(dropna=True).tolist()
     
     analysis.append("\nCOLUMN DETAILS:")
-    for col in data.columns:
-        col_info = []
+    for i, col in enumerate(data.columns):
+        col_info = [f"Type: {dtypes[i]}"]
         
-        dtype = str(data[col].dtype)
-        col_info.append(f"Type: {dtype}")
-        
-        unique_vals = data[col].dropna().unique()
-        unique_count = len(unique_vals)
-        col_info.append(f"Unique values: {unique_count}")
-        
-        if unique_count <= 10:
-            col_info.append(f"Values: {list(unique_vals)}")
-        elif unique_count <= 50:
-            col_info.append(f"Sample values: {list(unique_vals[:10])}...")
-        else:
-            if pd.api.types.is_numeric_dtype(data[col]):
-                col_info.append(f"Range: {data[col].min()} to {data[col].max()}")
+        if not schema_only:
+            series = data.iloc[:, i]
+            unique_count = int(unique_counts[i])
+            col_info.append(f"Unique values: {unique_count}")
+            
+            if unique_count <= 10:
+                col_info.append(f"Values: {distinct_values(series, 10, unique_count)}")
+            elif unique_count <= 50:
+                col_info.append(f"Sample values: {distinct_values(series, 10, unique_count)}...")
+            elif pd.api.types.is_numeric_dtype(series):
+                col_info.append(f"Range: {series.min()} to {series.max()}")
             else:
-                col_info.append(f"Sample values: {list(unique_vals[:5])}...")
+                col_info.append(f"Sample values: {distinct_values(series, 5, unique_count)}...")
         
-        null_count = data[col].isnull().sum()
-        if null_count > 0:
-            col_info.append(f"Missing: {null_count}")
+        if null_counts[i] > 0:
+            col_info.append(f"Missing: {null_counts[i]}")
         
         analysis.append(f"- {col}: {', '.join(col_info)}")
     
-    analysis.append(f"\nSAMPLE DATA (first 3 rows):")
-    sample_data = data.head(3).to_string()
-    analysis.append(sample_data)
+    if not schema_only:
+        # CSV states each column name once instead of padding every cell to width
+        analysis.append(f"\nSAMPLE DATA (first 3 rows, CSV with header):")
+        sample_data = data.head(3).to_csv(index=False)
+        analysis.append(sample_data)
     
     return "\n".join(analysis)
\ No newline at end of file
@@ -1,23 +1,142 @@
+import hashlib
+import importlib.util
 import os
-from typing import Optional, List, Any
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Any, Iterator
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
     REQUESTS_AVAILABLE = True
 except ImportError:
     print("Warning: requests library not available")
     REQUESTS_AVAILABLE = False
     requests = None
 
+if REQUESTS_AVAILABLE:
+    # One keep-alive session for all Google API calls, with backoff on 429/5xx
+    _SESSION = requests.Session()
+    _SESSION.mount('https://', HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    ))
+    _SESSION.headers["User-Agent"] = "ai-data-analytics-platform (+https://github.com/ark5234/AI-Agent-Project)"
+else:
+    _SESSION = None
+
+try:
+    import streamlit as st
+except ImportError:
+    st = None
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 try:
-    from googleapiclient.discovery import build
-    GOOGLE_API_AVAILABLE = True
+    import ijson
+    IJSON_AVAILABLE = True
 except ImportError:
+    IJSON_AVAILABLE = False
+
+def _get_secret(name: str) -> Optional[str]:
+    """Look a setting up in Streamlit secrets first, then the environment."""
+    try:
+        if st is not None and hasattr(st, "secrets") and name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        # st.secrets raises when no secrets.toml exists
+        pass
+    return os.getenv(name)
+
+def _response_json(response) -> Any:
+    """Decode a JSON response body, with orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(response.content)
+    return response.json()
+
+# Stale-while-revalidate cache: entries younger than SWR_FRESH_SECONDS are returned as-is,
+# older ones are returned immediately while a background thread refetches them. Entries past
+# SWR_MAX_AGE_SECONDS are dropped, and the least recently used go beyond SWR_MAX_ENTRIES.
+# Each entry keeps the response ETag, if any, so refreshes can revalidate instead of refetching
+SWR_FRESH_SECONDS = 300
+SWR_MAX_AGE_SECONDS = 3600
+SWR_MAX_ENTRIES = 64
+_swr_cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+_swr_refreshing: set = set()
+_swr_lock = threading.Lock()
+
+def _swr_key(*parts) -> bytes:
+    return hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=16).digest()
+
+def _swr_store(key: bytes, value, etag: Optional[str] = None) -> None:
+    now = time.monotonic()
+    with _swr_lock:
+        _swr_cache[key] = (now, value, etag)
+        _swr_cache.move_to_end(key)
+        for expired in [k for k, (stored_at, _, _) in _swr_cache.items() if now - stored_at > SWR_MAX_AGE_SECONDS]:
+            del _swr_cache[expired]
+        while len(_swr_cache) > SWR_MAX_ENTRIES:
+            _swr_cache.popitem(last=False)
+
+def _swr_refresh(key: bytes, fetch, previous: tuple) -> None:
+    try:
+        value, etag = fetch(previous)
+        if value:
+            _swr_store(key, value, etag)
+    finally:
+        with _swr_lock:
+            _swr_refreshing.discard(key)
+
+def _swr_get(key: bytes, fetch):
+    """fetch(previous) gets the cached (value, etag) or None and returns a new (value, etag)."""
+    now = time.monotonic()
+    with _swr_lock:
+        entry = _swr_cache.get(key)
+        if entry is not None and now - entry[0] > SWR_MAX_AGE_SECONDS:
+            del _swr_cache[key]
+            entry = None
+        elif entry is not None:
+            _swr_cache.move_to_end(key)
+    if entry is None:
+        value, etag = fetch(None)
+        # Failed or empty fetches are not cached so the next call retries
+        if value:
+            _swr_store(key, value, etag)
+        return value
+
+    stored_at, value, etag = entry
+    if now - stored_at > SWR_FRESH_SECONDS:
+        with _swr_lock:
+            start_refresh = key not in _swr_refreshing
+            _swr_refreshing.add(key)
+        if start_refresh:
+            threading.Thread(target=_swr_refresh, args=(key, fetch, (value, etag)), daemon=True).start()
+    return value
+
+# Only check availability here; importing googleapiclient.discovery is deferred to build()
+GOOGLE_API_AVAILABLE = importlib.util.find_spec("googleapiclient") is not None
+if not GOOGLE_API_AVAILABLE:
     print("Warning: Google API client libraries not available")
-    GOOGLE_API_AVAILABLE = False
-    # Create dummy functions to prevent import errors
-    def build(*args, **kwargs):
+
+def build(*args, **kwargs):
+    if not GOOGLE_API_AVAILABLE:
         return None
+    from googleapiclient.discovery import build as discovery_build
+    return discovery_build(*args, **kwargs)
+
+_SHEET_ID_RE = re.compile(r'/spreadsheets/d/([a-zA-Z0-9_-]+)')
+
+# Sheets service objects keyed by API key; build() parses a large discovery document
+_service_cache: dict = {}
 
 def authenticate_google_sheets() -> Optional[Any]:
     """
@@ -29,24 +148,20 @@ def authenticate_google_sheets() -> Optional[Any]:
         return None
         
     try:
-        # Get API key from environment or Streamlit secrets
-        import streamlit as st
-        
-        # Try to get from Streamlit secrets first, then environment
-        try:
-            if hasattr(st, "secrets") and "GOOGLE_API_KEY" in st.secrets:
-                api_key = st.secrets["GOOGLE_API_KEY"]
-            else:
-                api_key = os.getenv("GOOGLE_API_KEY")
-        except Exception:
-            api_key = os.getenv("GOOGLE_API_KEY")
+        # Get API key from Streamlit secrets first, then environment
+        api_key = _get_secret("GOOGLE_API_KEY")
         
         if not api_key:
             print("Google API Key not found. Please set GOOGLE_API_KEY in environment variables or Streamlit secrets.")
             return None
         
-        # Build the service with API key authentication
-        service = build('sheets', 'v4', developerKey=api_key)
+        # Build the service with API key authentication, once per key
+        service = _service_cache.get(api_key)
+        if service is None:
+            # Use the discovery document bundled with the client rather than fetching it
+            service = build('sheets', 'v4', developerKey=api_key,
+                            static_discovery=True, cache_discovery=False)
+            _service_cache[api_key] = service
         return service
     except Exception as e:
         print(f"An error occurred during authentication: {e}")
@@ -57,34 +172,107 @@ def read_google_sheet_public(spreadsheet_id: str, range_name: str, api_key: str)
     Read Google Sheet data using direct API calls for public sheets.
     This method works without OAuth2 authentication.
     """
+    value_ranges = read_google_sheets_batch(spreadsheet_id, [range_name], api_key)
+    if value_ranges is None:
+        return None
+    return value_ranges[0] if value_ranges else []
+
+def read_google_sheets_batch(spreadsheet_id: str, ranges: List[str], api_key: str) -> Optional[List[List[List[str]]]]:
+    """
+    Read several ranges of a public sheet in one values:batchGet round-trip.
+    Returns one list of rows per requested range, in request order.
+    """
     if not REQUESTS_AVAILABLE:
         print("Requests library not available")
         return None
-        
+    # Single ranges go through batchGet too: the range travels as an encoded query
+    # parameter instead of a URL path segment, and revalidation lives in one place
+    return _swr_get(
+        _swr_key("values", spreadsheet_id, api_key, *ranges),
+        lambda previous: _fetch_sheets_batch(spreadsheet_id, ranges, api_key, previous)
+    )
+
+def _fetch_sheets_batch(spreadsheet_id: str, ranges: List[str], api_key: str,
+                        previous: Optional[tuple]) -> tuple:
     try:
-        # Construct the URL for the Google Sheets API
-        url = f"https://sheets.googleapis.com/v4/spreadsheets/{spreadsheet_id}/values/{range_name}"
-        params = {
-            'key': api_key,
-            'majorDimension': 'ROWS',
-            'valueRenderOption': 'FORMATTED_VALUE'
-        }
+        url = f"https://sheets.googleapis.com/v4/spreadsheets/{spreadsheet_id}/values:batchGet"
+        params = [
+            ('key', api_key),
+            ('majorDimension', 'ROWS'),
+            ('valueRenderOption', 'FORMATTED_VALUE'),
+            ('fields', 'valueRanges.values'),
+        ] + [('ranges', range_name) for range_name in ranges]
         
-        # Double-check requests availability before using it
-        if not REQUESTS_AVAILABLE or requests is None:
-            print("Requests library not available for API call")
-            return None
+        # Revalidate with the cached entry's ETag so unchanged ranges cost a bodiless 304
+        etag = previous[1] if previous else None
+        headers = {'If-None-Match': etag} if etag else None
         
-        response = requests.get(url, params=params)
+        response = _SESSION.get(url, params=params, headers=headers, timeout=(5, 30))
+        if response.status_code == 304 and etag:
+            return previous
         response.raise_for_status()
         
-        data = response.json()
-        return data.get('values', [])
+        data = _response_json(response)
+        value_ranges = [value_range.get('values', []) for value_range in data.get('valueRanges', [])]
+        return value_ranges, response.headers.get('ETag')
         
     except Exception as e:
-        # Simple error handling that works regardless of requests availability
         print(f"An error occurred: {e}")
-        return None
+        return None, None
+
+def read_sheet_grid(spreadsheet_id: str, api_key: str) -> dict:
+    """
+    Return {title: (row_count, column_count)} for every tab of a public sheet.
+    Raises on failure instead of returning None so callers can keep errors out of their caches.
+    """
+    if not REQUESTS_AVAILABLE:
+        raise RuntimeError("Requests library not available")
+    url = f"https://sheets.googleapis.com/v4/spreadsheets/{spreadsheet_id}"
+    params = {
+        'key': api_key,
+        'fields': 'sheets.properties(title,gridProperties(rowCount,columnCount))'
+    }
+    
+    response = _SESSION.get(url, params=params, timeout=(5, 30))
+    response.raise_for_status()
+    
+    sheet_grid = {}
+    for sheet in _response_json(response).get('sheets', []):
+        properties = sheet.get('properties', {})
+        grid = properties.get('gridProperties', {})
+        sheet_grid[properties.get('title', 'Unknown')] = (grid.get('rowCount', 0), grid.get('columnCount', 0))
+    return sheet_grid
+
+def read_google_sheet_public_iter(spreadsheet_id: str, range_name: str, api_key: str) -> Iterator[List[str]]:
+    """
+    Yield the rows of a public sheet range as they are parsed off the wire.
+    Meant for very large ranges where holding the body and the row list at once
+    is too much; rows are not cached. Falls back to read_google_sheet_public
+    when ijson is not installed.
+    """
+    if not IJSON_AVAILABLE:
+        yield from read_google_sheet_public(spreadsheet_id, range_name, api_key) or []
+        return
+    if not REQUESTS_AVAILABLE:
+        print("Requests library not available")
+        return
+        
+    url = f"https://sheets.googleapis.com/v4/spreadsheets/{spreadsheet_id}/values:batchGet"
+    params = [
+        ('key', api_key),
+        ('majorDimension', 'ROWS'),
+        ('valueRenderOption', 'FORMATTED_VALUE'),
+        ('fields', 'valueRanges.values'),
+        ('ranges', range_name),
+    ]
+    try:
+        with _SESSION.get(url, params=params, stream=True, timeout=(5, 30)) as response:
+            response.raise_for_status()
+            # Let urllib3 undo gzip before ijson sees the bytes
+            response.raw.decode_content = True
+            yield from ijson.items(response.raw, 'valueRanges.item.values.item', use_float=True)
+    except Exception as e:
+        print(f"An error occurred: {e}")
 
 def read_google_sheet(service: Any, spreadsheet_id: str, range_name: str) -> Optional[List[List[str]]]:
     """
@@ -108,16 +296,7 @@ def read_google_sheet(service: Any, spreadsheet_id: str, range_name: str) -> Opt
                 return values
         
         # Fallback to direct API approach
-        import streamlit as st
-        
-        # Get API key
-        try:
-            if hasattr(st, "secrets") and "GOOGLE_API_KEY" in st.secrets:
-                api_key = st.secrets["GOOGLE_API_KEY"]
-            else:
-                api_key = os.getenv("GOOGLE_API_KEY")
-        except Exception:
-            api_key = os.getenv("GOOGLE_API_KEY")
+        api_key = _get_secret("GOOGLE_API_KEY")
         
         if not api_key:
             print("Google API Key not found for fallback method.")
@@ -137,25 +316,11 @@ def extract_sheet_id_from_url(url: str) -> Optional[str]:
     """
     Extract the spreadsheet ID from a Google Sheets URL.
     """
-    try:
-        # Handle different URL formats
-        if '/spreadsheets/d/' in url:
-            # Standard Google Sheets URL format
-            start = url.find('/spreadsheets/d/') + len('/spreadsheets/d/')
-            end = url.find('/', start)
-            if end == -1:
-                end = url.find('?', start)
-            if end == -1:
-                end = url.find('#', start)
-            if end == -1:
-                end = len(url)
-            return url[start:end]
-        else:
-            # If it's already just the ID
-            return url
-    except Exception as e:
-        print(f"Error extracting sheet ID: {e}")
-        return None
+    # Standard Google Sheets URL format; a bare ID is returned as-is, other URLs are rejected
+    match = _SHEET_ID_RE.search(url)
+    if match:
+        return match.group(1)
+    return url if '/' not in url else None
 
 def fetch_google_search_results(query, num_results=10):
     """
@@ -166,53 +331,72 @@ def fetch_google_search_results(query, num_results=10):
         return []
         
     try:
-        import streamlit as st
-        
         # Get API key and search engine ID
-        try:
-            if hasattr(st, "secrets") and "GOOGLE_API_KEY" in st.secrets:
-                api_key = st.secrets["GOOGLE_API_KEY"]
-                search_engine_id = st.secrets.get("GOOGLE_SEARCH_ENGINE_ID")
-            else:
-                api_key = os.getenv("GOOGLE_API_KEY")
-                search_engine_id = os.getenv("GOOGLE_SEARCH_ENGINE_ID")
-        except Exception:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            search_engine_id = os.getenv("GOOGLE_SEARCH_ENGINE_ID")
+        api_key = _get_secret("GOOGLE_API_KEY")
+        search_engine_id = _get_secret("GOOGLE_SEARCH_ENGINE_ID")
         
         if not api_key or not search_engine_id:
             print("Google API Key or Search Engine ID not found in environment variables.")
             return []
         
+        return _swr_get(
+            _swr_key("search", query, num_results, search_engine_id, api_key),
+            lambda previous: (_fetch_search_results(query, num_results, api_key, search_engine_id), None)
+        )
+        
+    except Exception as e:
+        print(f"An error occurred during search: {e}")
+        return []
+
+def _fetch_search_results(query, num_results, api_key, search_engine_id):
+    # The API returns at most 10 items per request and 100 per query,
+    # so larger requests fetch their pages concurrently
+    num_results = max(1, min(num_results, 100))
+    starts = range(1, num_results + 1, 10)
+    if len(starts) == 1:
+        return _fetch_search_page(query, 1, num_results, api_key, search_engine_id)
+    with ThreadPoolExecutor(max_workers=len(starts)) as executor:
+        pages = list(executor.map(
+            lambda start: _fetch_search_page(query, start, min(10, num_results - start + 1), api_key, search_engine_id),
+            starts
+        ))
+    return [item for page in pages for item in page]
+
+_SEARCH_FIELDS = ('title', 'link', 'snippet')
+
+def _fetch_search_page(query, start, num, api_key, search_engine_id):
+    try:
         url = "https://www.googleapis.com/customsearch/v1"
         params = {
             'key': api_key,
             'cx': search_engine_id,
             'q': query,
-            'num': min(num_results, 10)  # API limit is 10 per request
+            'num': num,  # API limit is 10 per request
+            'start': start,
+            # Only the fields read below; pagemap alone can be several KB per item
+            'fields': f"items({','.join(_SEARCH_FIELDS)})"
         }
         
-        # Double-check requests availability before using it
-        if not REQUESTS_AVAILABLE or requests is None:
-            print("Requests library not available for API call")
-            return []
-        
-        response = requests.get(url, params=params)
+        response = _SESSION.get(url, params=params, timeout=(5, 30))
         response.raise_for_status()
         
-        data = response.json()
-        results = []
-        
-        for item in data.get('items', []):
-            results.append({
-                'title': item.get('title', ''),
-                'link': item.get('link', ''),
-                'snippet': item.get('snippet', '')
-            })
-        
-        return results
+        data = _response_json(response)
+        return [
+            {field: item.get(field, '') for field in _SEARCH_FIELDS}
+            for item in data.get('items', ())
+        ]
         
     except Exception as e:
         # Simple error handling that works regardless of requests availability
         print(f"An error occurred during search: {e}")
         return []
+
+def fetch_google_search_results_many(queries: List[str], num_results: int = 10) -> List[List[dict]]:
+    """
+    Run several searches concurrently; total latency is roughly one round-trip
+    instead of one per query. Results are returned in query order.
+    """
+    if not queries:
+        return []
+    with ThreadPoolExecutor(max_workers=min(8, len(queries))) as executor:
+        return list(executor.map(lambda q: fetch_google_search_results(q, num_results), queries))
@@ -1,23 +1,44 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import codecs
+import importlib.util
 import io
 import os
 import sys
 import re
+import tempfile
+import stat
+import time
 import hashlib
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from typing import Optional, List, Any, Union
+import operator
+from functools import lru_cache
+from typing import Optional, List, Any, NamedTuple
 from dotenv import load_dotenv
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pa_csv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Rust-backed Excel reader used by pandas' 'calamine' engine; openpyxl is the fallback
+CALAMINE_AVAILABLE = importlib.util.find_spec("python_calamine") is not None
+
+# Numba takes ~1s to import and only large filters use it, so import it on first use
+NUMBA_AVAILABLE = importlib.util.find_spec("numba") is not None
+
 # Import Google API functions with proper type handling
 try:
     from google_api import (  # type: ignore
         authenticate_google_sheets,  # type: ignore
         read_google_sheet,  # type: ignore
         extract_sheet_id_from_url,  # type: ignore
-        read_google_sheet_public  # type: ignore
+        read_google_sheet_public,  # type: ignore
+        read_sheet_grid  # type: ignore
     )
     GOOGLE_SHEETS_AVAILABLE = True
 except ImportError:
@@ -30,10 +51,11 @@ except ImportError:
         return None
     def read_google_sheet_public(spreadsheet_id: str, range_name: str, api_key: str) -> Optional[List[List[str]]]:
         return None
+    def read_sheet_grid(spreadsheet_id: str, api_key: str) -> dict:
+        raise RuntimeError("Google Sheets support is not available")
 
-import requests
-from googleapiclient.discovery import build
-from gemini_api import query_gemini
+from gemini_api import query_gemini, distinct_values
+from frames import sheet_values_to_frame, optimize_dtypes
 
 APP_DIR = os.path.dirname(__file__)
 if APP_DIR not in sys.path:
@@ -41,29 +63,70 @@ if APP_DIR not in sys.path:
 
 load_dotenv()
 
-def get_sheet_names(sheet_id, api_key):
-    """Get available sheet names from a Google Spreadsheet."""
+# Column dtypes treated as text by filters and charts (object, dictionary-encoded, Arrow strings)
+TEXT_DTYPES = ['object', 'category', 'string']
+
+# Parsed uploads persisted as Feather, keyed by content hash, for reuse across sessions.
+# The directory is private to the app's user and trimmed oldest-first by age and total size;
+# its suffix is bumped whenever CSV parsing changes so frames parsed the old way are not served
+UPLOAD_CACHE_DIR = os.path.join(tempfile.gettempdir(), "ai_data_analytics_uploads_v2")
+UPLOAD_CACHE_MAX_BYTES = 512 * 1024 * 1024
+UPLOAD_CACHE_MAX_AGE = 24 * 60 * 60
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_sheet_grid(sheet_id, api_key):
+    """Fetch {title: (row_count, column_count)}; raises on failure so errors are never cached."""
+    return read_sheet_grid(sheet_id, api_key)
+
+def get_sheet_grid(sheet_id, api_key):
+    """Get sheet names with their grid size as {title: (row_count, column_count)}."""
     try:
-        url = f"https://sheets.googleapis.com/v4/spreadsheets/{sheet_id}"
-        params = {'key': api_key}
-        
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        data = response.json()
-        sheets = data.get('sheets', [])
-        
-        sheet_names = []
-        for sheet in sheets:
-            properties = sheet.get('properties', {})
-            sheet_name = properties.get('title', 'Unknown')
-            sheet_names.append(sheet_name)
-        
-        return sheet_names
-        
-    except Exception as e:
+        return _fetch_sheet_grid(sheet_id, api_key)
+    except Exception:
         return None
 
+def column_letter(index):
+    """Convert a 1-based column index to A1 letters (1 -> A, 27 -> AA)."""
+    letters = ""
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+def sheet_range(sheet_name, sheet_grid=None):
+    """A1 range covering the sheet's grid, or the A:Z fallback when its size is unknown."""
+    rows, cols = (sheet_grid or {}).get(sheet_name, (0, 0))
+    if rows and cols:
+        return f"{sheet_name}!A1:{column_letter(cols)}{rows}"
+    return f"{sheet_name}!A:Z"
+
+@st.cache_resource(show_spinner=False)
+def get_sheets_service():
+    """Build the Google Sheets service once per process instead of on every rerun."""
+    return authenticate_google_sheets()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_sheet_values(sheet_id, range_name, api_key):
+    """Fetch sheet values, reusing the result across reruns for 60 seconds."""
+    # Try direct API method first for public sheets
+    values = read_google_sheet_public(sheet_id, range_name, api_key)
+
+    # If direct method fails, try service-based method as fallback
+    if not values:
+        service = get_sheets_service()
+        if service:
+            values = read_google_sheet(service, sheet_id, range_name)
+    return values
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_sheet_frame(sheet_id, range_name, api_key):
+    """Sheet values as a DataFrame with the first row as headers, or None if the sheet is empty."""
+    values = load_sheet_values(sheet_id, range_name, api_key)
+    if not values:
+        return None
+    # Sheets cells arrive as strings; Arrow-backed and categorical columns render and filter faster
+    return optimize_dtypes(sheet_values_to_frame(values))
+
 def get_secret(key: str, default: str | None = None) -> str | None:
     """Return a config value, preferring Streamlit Cloud secrets then env vars.
     - Uses membership test to avoid KeyError and avoid depending on Mapping.get implementation.
@@ -79,16 +142,20 @@ def get_secret(key: str, default: str | None = None) -> str | None:
     if val:
         return val
     # Optional local secrets file support for development only
+    return local_secrets().get(key, default)
+
+@st.cache_resource(show_spinner=False)
+def local_secrets() -> dict:
+    """Parse the development secrets.toml once per process; empty when absent or unreadable."""
     try:
         local_secrets_path = os.path.join(os.path.dirname(APP_DIR), ".streamlit", "secrets.toml")
         if os.path.exists(local_secrets_path):
             import tomllib  # py311+
             with open(local_secrets_path, "rb") as f:
-                data = tomllib.load(f)
-            return data.get(key, default)
+                return tomllib.load(f)
     except Exception:
         pass
-    return default
+    return {}
 
 # Resolve API keys
 GOOGLE_API_KEY = get_secret("GOOGLE_API_KEY")
@@ -127,12 +194,26 @@ if not GEMINI_API_KEY:
             pass
         st.stop()
 
-@st.cache_data(ttl=3600)
-def cached_dataset_analysis(data_hash, columns_str, shape_str):
-    """Cache dataset analysis for 1 hour to improve performance"""
-    return None
+# Page chrome emitted on every run; Streamlit needs it re-sent each rerun, so only the text is shared
+APP_CSS = """
+<style>
+.main > div { padding-top: 1rem; }
+.stAlert > div { border-radius: 10px; }
+</style>
+"""
 
-def validate_csv_file(file):
+FOOTER_HTML = """
+<div style='text-align: center; padding: 1rem; color: #666;'>
+    🤖 AI Data Analytics Platform | 
+    <a href='https://github.com/ark5234/AI-Agent-Project' target='_blank'>GitHub</a> | 
+    <a href='https://ai-data-analytics-agent.streamlit.app/' target='_blank'>Live Demo</a>
+</div>
+"""
+
+# Upload formats accepted by validate_csv_file, in display order
+ALLOWED_EXTENSIONS = ('.csv', '.xlsx', '.xls', '.json')
+
+def validate_csv_file(file, file_extension=None):
     """Comprehensive file validation for security and performance"""
     if file is None:
         return False, "No file provided"
@@ -143,13 +224,16 @@ def validate_csv_file(file):
         return False, f"File too large ({file.size / 1024 / 1024:.1f}MB). Maximum allowed: 50MB"
     
     # Extension validation
-    allowed_extensions = ['.csv', '.xlsx', '.xls', '.json']
-    file_extension = os.path.splitext(file.name)[1].lower()
-    if file_extension not in allowed_extensions:
-        return False, f"Unsupported file format: {file_extension}. Allowed: {', '.join(allowed_extensions)}"
+    if file_extension is None:
+        file_extension = os.path.splitext(file.name)[1].lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
+        return False, f"Unsupported file format: {file_extension}. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
     
     return True, "File validation passed"
 
+# SQL statement keywords rejected in queries, matched as whole words in one pass
+DANGEROUS_KEYWORD_RE = re.compile(r'\b(DROP|DELETE|INSERT|UPDATE|ALTER|CREATE|TRUNCATE)\b', re.IGNORECASE)
+
 def validate_query_input(query):
     """Validate user query for security and quality"""
     if not query or len(query.strip()) == 0:
@@ -159,11 +243,9 @@ def validate_query_input(query):
         return False, "Query too long (max 1000 characters)"
     
     # Basic SQL injection prevention
-    dangerous_patterns = ['DROP', 'DELETE', 'INSERT', 'UPDATE', 'ALTER', 'CREATE', 'TRUNCATE']
-    query_upper = query.upper()
-    for pattern in dangerous_patterns:
-        if pattern in query_upper:
-            return False, f"Query contains potentially dangerous keyword: {pattern}"
+    match = DANGEROUS_KEYWORD_RE.search(query)
+    if match:
+        return False, f"Query contains potentially dangerous keyword: {match.group(1).upper()}"
     
     return True, "Query validation passed"
 
@@ -189,36 +271,203 @@ def safe_data_processing(func):
             return None
     return wrapper
 
-@safe_data_processing
-def secure_read_csv(file):
-    """Safely read CSV with comprehensive error handling"""
+def _pandas_column_names(names: List[str]) -> List[str]:
+    """Rename blank and repeated headers as pandas does ('' -> 'Unnamed: 2', 'a', 'a' -> 'a', 'a.1')."""
+    names = [name or f"Unnamed: {i}" for i, name in enumerate(names)]
+    counts: dict = {}
+    for i, name in enumerate(names):
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        names[i] = name
+        counts[name] = count + 1
+    return names
+
+def _read_arrow_csv(raw: bytes, encoding: str, names: List[str], string_columns: set) -> "pa.Table":
+    return pa_csv.read_csv(
+        io.BytesIO(raw),
+        # Column types are inferred from the first block; 16MB blocks see far more
+        # rows than the 1MB default, so late type changes rarely force the pandas retry
+        read_options=pa_csv.ReadOptions(encoding=encoding, block_size=16 << 20, column_names=names, skip_rows=1),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in string_columns},
+            strings_can_be_null=True
+        )
+    )
+
+def _parse_csv(raw: bytes, encoding: str) -> pd.DataFrame:
+    """Parse with Arrow's multithreaded C++ reader, deferring to pandas on anything it rejects."""
+    if PYARROW_AVAILABLE:
+        try:
+            # Arrow keeps blank and repeated headers verbatim, which st.dataframe rejects, so read
+            # the header from a small first block and pass the names pandas would have given
+            header = pa_csv.open_csv(
+                io.BytesIO(raw), read_options=pa_csv.ReadOptions(encoding=encoding, block_size=1 << 16)
+            ).schema
+            names = _pandas_column_names(header.names)
+            # pandas leaves dates and times as text; keep columns Arrow would make temporal as strings
+            string_columns = {name for name, field in zip(names, header) if pa.types.is_temporal(field.type)}
+            table = _read_arrow_csv(raw, encoding, names, string_columns)
+            late_temporal = {name for name, field in zip(names, table.schema) if pa.types.is_temporal(field.type)}
+            if late_temporal:
+                # Columns that were empty in the header block but hold dates further down
+                table = _read_arrow_csv(raw, encoding, names, string_columns | late_temporal)
+            # Free Arrow buffers column by column while converting to keep peak memory near 1x
+            return table.to_pandas(split_blocks=True, self_destruct=True)
+        except pa.ArrowInvalid:
+            # Bad UTF-8, ragged rows, empty file: pandas raises the errors callers handle
+            pass
+    # low_memory=False infers each column's dtype once over the whole file instead of per chunk
+    return pd.read_csv(io.BytesIO(raw), encoding=encoding, low_memory=False)
+
+def _upload_cache_path(raw: bytes) -> str:
+    # BLAKE2b is several times faster than SHA-256 over large uploads; 128 bits is ample for a cache key
+    return os.path.join(UPLOAD_CACHE_DIR, f"{hashlib.blake2b(raw, digest_size=16).hexdigest()}.feather")
+
+def _upload_cache_dir() -> Optional[str]:
+    """Create the upload cache directory as 0700; None if it exists but isn't ours alone."""
+    try:
+        os.makedirs(UPLOAD_CACHE_DIR, mode=0o700, exist_ok=True)
+        info = os.lstat(UPLOAD_CACHE_DIR)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(info.st_mode):
+        return None
+    # A shared tempdir lets anyone pre-create the path; never write uploads into theirs
+    if os.name == "posix" and (info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) & 0o077):
+        return None
+    return UPLOAD_CACHE_DIR
+
+def _evict_uploads() -> None:
+    """Delete cached uploads older than UPLOAD_CACHE_MAX_AGE, then least recently used ones over the size cap."""
+    try:
+        entries = [entry for entry in os.scandir(UPLOAD_CACHE_DIR) if entry.is_file(follow_symlinks=False)]
+        files = sorted(((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries), reverse=True)
+    except OSError:
+        return
+    cutoff = time.time() - UPLOAD_CACHE_MAX_AGE
+    total = 0
+    for mtime, size, path in files:
+        total += size
+        if mtime < cutoff or total > UPLOAD_CACHE_MAX_BYTES:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _persist_upload(data: pd.DataFrame, path: str) -> None:
+    """Write a parsed upload as an owner-only Feather file; best effort, skipped for frames Arrow can't store."""
+    if not PYARROW_AVAILABLE or _upload_cache_dir() is None:
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            data.to_feather(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return
+    _evict_uploads()
+
+def _is_utf8(raw: bytes) -> bool:
+    """Validate UTF-8 in 1MB steps, without materializing the decoded text."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    view = memoryview(raw)
+    try:
+        for start in range(0, len(view), 1 << 20):
+            decoder.decode(view[start:start + (1 << 20)])
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def _detect_encoding(raw: bytes) -> str:
+    """Pick the encoding to parse with, so non-UTF-8 files skip a failed UTF-8 parse."""
+    if raw.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    if _is_utf8(raw):
+        return "utf-8"
+    # Statistical guessers misread short Western-European files as CJK or UTF-16 without
+    # any decode error; cp1252 is the usual non-UTF-8 export and falls back to latin1 on
+    # the few bytes it leaves undefined
+    return "cp1252"
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _load_csv(raw: bytes) -> tuple[pd.DataFrame, str]:
+    """Parse CSV bytes once per upload; returns the frame and the encoding used ("skip" if lines were dropped)."""
+    # Re-uploads of a file seen by an earlier session load the Arrow copy instead of re-parsing
+    cache_path = _upload_cache_path(raw)
+    if PYARROW_AVAILABLE and _upload_cache_dir() is not None and os.path.exists(cache_path):
+        try:
+            data = pd.read_feather(cache_path)
+            # Mark the file recently used so size-based eviction drops colder uploads first
+            os.utime(cache_path)
+            return data, "utf-8"
+        except Exception:
+            pass
+    encoding = _detect_encoding(raw)
     try:
-        # Try UTF-8 first
-        data = pd.read_csv(file, encoding="utf-8")
-        return data
+        data = optimize_dtypes(_parse_csv(raw, encoding))
     except UnicodeDecodeError:
         try:
-            # Fallback to latin1
-            file.seek(0)  # Reset file pointer
-            data = pd.read_csv(file, encoding="latin1")
-            st.warning("⚠️ File encoding detected as Latin1. Some characters may not display correctly.")
-            return data
+            # latin1 maps every byte
+            return optimize_dtypes(_parse_csv(raw, "latin1")), "latin1"
         except Exception:
             # Final fallback
-            file.seek(0)
-            data = pd.read_csv(file, encoding="utf-8", on_bad_lines='skip')
-            st.warning("⚠️ Some problematic lines were skipped due to encoding issues.")
-            return data
+            data = pd.read_csv(io.BytesIO(raw), encoding="utf-8", on_bad_lines='skip')
+            return optimize_dtypes(data), "skip"
+    if encoding == "utf-8":
+        _persist_upload(data, cache_path)
+    return data, encoding
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _load_excel(raw: bytes) -> pd.DataFrame:
+    """Parse workbook bytes once per upload."""
+    engine = 'calamine' if CALAMINE_AVAILABLE else 'openpyxl'
+    return optimize_dtypes(pd.read_excel(io.BytesIO(raw), engine=engine))
+
+def _is_ndjson(raw: bytes) -> bool:
+    """True for newline-delimited JSON: a complete object on the first line and more data after it."""
+    body = raw.lstrip()
+    first_line, _, rest = body.partition(b"\n")
+    if not first_line.startswith(b"{") or not rest.strip():
+        return False
+    try:
+        return isinstance(json.loads(first_line), dict)
+    except ValueError:
+        return False
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _load_json(raw: bytes) -> pd.DataFrame:
+    """Parse JSON bytes once per upload; newline-delimited records are read line by line."""
+    # A plain read_json rejects NDJSON ("Trailing data"), so route it through the lines parser
+    return optimize_dtypes(pd.read_json(io.BytesIO(raw), lines=_is_ndjson(raw)))
+
+@safe_data_processing
+def secure_read_csv(file):
+    """Safely read CSV with comprehensive error handling"""
+    data, encoding = _load_csv(file.getvalue())
+    if encoding == "skip":
+        st.warning("⚠️ Some problematic lines were skipped due to encoding issues.")
+    elif encoding != "utf-8":
+        st.warning(f"⚠️ File encoding detected as {encoding}. Some characters may not display correctly.")
+    return data
 
 @safe_data_processing
 def secure_read_excel(file):
     """Safely read Excel files with error handling"""
-    return pd.read_excel(file, engine='openpyxl')
+    return _load_excel(file.getvalue())
 
 @safe_data_processing
 def secure_read_json(file):
     """Safely read JSON files with error handling"""
-    return pd.read_json(file)
+    return _load_json(file.getvalue())
 
 def main():
     # Hero section with improved branding
@@ -285,6 +534,37 @@ def main():
     elif input_option == "📄 Upload File (CSV, Excel, JSON)":
         handle_csv_upload()
 
+def session_cached(name: str, source_key: Any, load):
+    """Keep the last loaded value for this session until its source changes.
+
+    Unlike st.cache_data this hands back the same object on every rerun,
+    with no unpickling or copy. Callers must not mutate it. Failed loads
+    (None) are not kept.
+    """
+    state = st.session_state
+    if state.get(f"{name}_source") != source_key:
+        value = load()
+        if value is None:
+            return None
+        state[name] = value
+        state[f"{name}_source"] = source_key
+    return state[name]
+
+# Rows sent to the browser per st.dataframe render; larger frames are paged
+PAGE_SIZE = 500
+
+def paged_dataframe(data: pd.DataFrame, key: str, height: Optional[int] = None) -> None:
+    """Render one page of a large frame so each rerun serializes at most PAGE_SIZE rows."""
+    kwargs = {"height": height} if height else {}
+    if len(data) <= PAGE_SIZE:
+        st.dataframe(data, **kwargs)
+        return
+    last_page = (len(data) - 1) // PAGE_SIZE + 1
+    page = st.number_input(f"Page (of {last_page:,})", min_value=1, max_value=last_page, value=1, step=1, key=key)
+    start = (int(page) - 1) * PAGE_SIZE
+    st.dataframe(data.iloc[start:start + PAGE_SIZE], **kwargs)
+    st.caption(f"Showing rows {start + 1:,}–{min(start + PAGE_SIZE, len(data)):,} of {len(data):,}")
+
 def handle_google_sheets():
     st.markdown("### 🔗 Connect to Google Sheets")
     st.info("💡 **Tip**: Make sure your Google Sheet is publicly accessible or shared with the service account.")
@@ -316,7 +596,8 @@ def handle_google_sheets():
         
         # Try to get available sheet names
         with st.spinner("🔍 Discovering available sheets..."):
-            available_sheets = get_sheet_names(sheet_id, api_key)
+            sheet_grid = get_sheet_grid(sheet_id, api_key)
+            available_sheets = list(sheet_grid) if sheet_grid else None
         
         if available_sheets:
             st.success(f"✅ Found {len(available_sheets)} sheets: {', '.join(available_sheets)}")
@@ -339,27 +620,14 @@ def handle_google_sheets():
         if sheet_name:
             try:
                 with st.spinner("📥 Loading data from Google Sheets..."):
-                    range_name = f"{sheet_name}!A:Z"
-                    
-                    # Try direct API method first for public sheets
-                    values = read_google_sheet_public(sheet_id, range_name, api_key)
-                    
-                    # If direct method fails, try service-based method as fallback
-                    if not values:
-                        service = authenticate_google_sheets()
-                        if service:
-                            values = read_google_sheet(service, sheet_id, range_name)
-                
-                if values and len(values) > 0:
-                    headers = values[0]
-                    data_rows = values[1:] if len(values) > 1 else []
-                    
-                    if data_rows:
-                        data = pd.DataFrame(data_rows, columns=headers)
-                        
+                    range_name = sheet_range(sheet_name, sheet_grid)
+                    data = load_sheet_frame(sheet_id, range_name, api_key)
+
+                if data is not None:
+                    if not data.empty:
                         st.success(f"✅ Successfully loaded {len(data)} rows from Google Sheets!")
                         st.markdown("### 📊 Data Preview")
-                        st.dataframe(data, height=400)
+                        paged_dataframe(data, key="sheet_preview_page", height=400)
                         main_column_selection(data)
                     else:
                         st.warning("⚠️ Sheet contains headers but no data rows.")
@@ -393,7 +661,8 @@ def handle_csv_upload():
                 st.write(f"**{key}**: {value}")
         
         # Validate file first
-        is_valid, message = validate_csv_file(uploaded_file)
+        file_extension = os.path.splitext(uploaded_file.name)[1].lower()
+        is_valid, message = validate_csv_file(uploaded_file, file_extension)
         if not is_valid:
             st.error(f"❌ {message}")
             return
@@ -401,18 +670,18 @@ def handle_csv_upload():
         st.success(f"✅ {message}")
         
         # Determine file type and read accordingly
-        file_extension = os.path.splitext(uploaded_file.name)[1].lower()
-        
         with st.spinner(f"📖 Processing {file_extension} file..."):
             if file_extension == '.csv':
-                data = secure_read_csv(uploaded_file)
+                reader = secure_read_csv
             elif file_extension in ['.xlsx', '.xls']:
-                data = secure_read_excel(uploaded_file)
+                reader = secure_read_excel
             elif file_extension == '.json':
-                data = secure_read_json(uploaded_file)
+                reader = secure_read_json
             else:
                 st.error("❌ Unsupported file format")
                 return
+            source_key = (uploaded_file.name, uploaded_file.size, getattr(uploaded_file, "file_id", None))
+            data = session_cached("upload_data", source_key, lambda: reader(uploaded_file))
         
         if data is not None:
             # Display success metrics
@@ -422,7 +691,10 @@ def handle_csv_upload():
             with col2:
                 st.metric("📋 Columns", len(data.columns))
             with col3:
-                st.metric("💾 Memory", f"{data.memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB")
+                # deep=True walks every string cell, so measure once per upload rather than per rerun
+                memory_mb = session_cached("upload_memory_mb", source_key,
+                                           lambda: data.memory_usage(deep=True).sum() / 1024 / 1024)
+                st.metric("💾 Memory", f"{memory_mb:.1f} MB")
             
             st.markdown("### 👀 Data Preview")
             st.dataframe(data.head(10), height=300)
@@ -445,6 +717,27 @@ def handle_csv_upload():
         else:
             st.error("❌ Failed to read the file. Please check the format and try again.")
 
+@st.cache_data(show_spinner=False, max_entries=8)
+def column_overview(data: pd.DataFrame) -> list[str]:
+    """One summary line per column, computed once per dataset rather than on every rerun."""
+    # Whole-frame passes; samples come from a short prefix of each column
+    dtypes = data.dtypes
+    unique_counts = data.nunique()
+    missing_counts = data.isna().sum()
+    overview = []
+    for i, col in enumerate(data.columns):
+        unique_count = int(unique_counts.iloc[i])
+        missing_count = int(missing_counts.iloc[i])
+        
+        col_info = f"**{col}**"
+        col_info += f" • Type: {dtypes.iloc[i]}"
+        col_info += f" • Unique: {unique_count:,}"
+        if missing_count > 0:
+            col_info += f" • Missing: {missing_count:,}"
+        col_info += f" • Sample: {distinct_values(data.iloc[:, i], 5, unique_count)}"
+        overview.append(col_info)
+    return overview
+
 def main_column_selection(data):
     if not data.empty:
         st.markdown("---")
@@ -474,27 +767,23 @@ def main_column_selection(data):
             numeric_cols = len(data.select_dtypes(include=['number']).columns)
             st.info(f"� **Numeric Columns**\n{numeric_cols} available")
         with col3:
-            text_cols = len(data.select_dtypes(include=['object']).columns)
+            text_cols = len(data.select_dtypes(include=TEXT_DTYPES).columns)
             st.info(f"📝 **Text Columns**\n{text_cols} available")
         
         # Column details in expandable section
         with st.expander("📋 Detailed Column Information", expanded=False):
-            for col in data.columns:
-                unique_count = data[col].nunique()
-                sample_vals = data[col].dropna().unique()[:5]
-                missing_count = data[col].isnull().sum()
-                
-                col_info = f"**{col}**"
-                col_info += f" • Type: {data[col].dtype}"
-                col_info += f" • Unique: {unique_count:,}"
-                if missing_count > 0:
-                    col_info += f" • Missing: {missing_count:,}"
-                col_info += f" • Sample: {list(sample_vals)}"
-                
+            for col_info in column_overview(data):
                 st.write(col_info)
         
         process_and_download(data, main_column)
 
+@st.cache_data(show_spinner=False, max_entries=8)
+def encode_csv(data: pd.DataFrame) -> bytes:
+    """UTF-8 CSV bytes for a download button, reused across reruns for the same result."""
+    buf = io.BytesIO()
+    data.to_csv(buf, index=False, encoding="utf-8")
+    return buf.getvalue()
+
 def process_and_download(data, main_column):
     placeholder_text = f"e.g., Show records where [column] is [value], Count [category], Find [condition]"
     query = st.text_input(f"Enter your query (AI will understand automatically):", placeholder=placeholder_text)
@@ -520,7 +809,7 @@ def process_and_download(data, main_column):
             if not result.empty:
                 # If result is a valid DataFrame, show the results
                 st.write("Query result:")
-                st.dataframe(result)
+                paged_dataframe(result, key="query_result_page")
 
                 # Generate smart visualizations
                 with st.expander("📊 Data Visualization", expanded=True):
@@ -530,10 +819,9 @@ def process_and_download(data, main_column):
                     else:
                         st.info("💡 Tip: Try queries like 'show trend', 'compare categories', or 'distribution' for automatic charts")
 
-                csv = result.to_csv(index=False)
                 st.download_button(
                     label="Download results as CSV",
-                    data=csv,
+                    data=encode_csv(result),
                     file_name="query_results.csv",
                     mime="text/csv",
                 )
@@ -557,18 +845,14 @@ def process_and_download(data, main_column):
             web_results = web_search(query)
             if web_results:
                 st.subheader("Web Search Results:")
-                for item in web_results:
-                    st.write(f"**{item['title']}**: [Link]({item['link']})")
-                    st.write(item['snippet'])
+                st.markdown(search_results_markdown(web_results))
                 return
         # If processing failed, still try fallbacks
         st.info("Couldn’t process query locally. Trying web search...")
         web_results = web_search(query)
         if web_results:
             st.subheader("Web Search Results:")
-            for item in web_results:
-                st.write(f"**{item['title']}**: [Link]({item['link']})")
-                st.write(item['snippet'])
+            st.markdown(search_results_markdown(web_results))
             return
         response = query_gemini_ai(query, data)
         if response:
@@ -606,56 +890,151 @@ def process_query(data: pd.DataFrame, query: str, main_column: str) -> Optional[
         st.error(f"Error: {e}")
         return None
 
+def as_text_column(series: pd.Series):
+    """Stringify a column once into the buffer contains_mask searches (Arrow array or pandas)."""
+    if PYARROW_AVAILABLE:
+        if pd.api.types.is_string_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+            # Already text: hand the strings to Arrow directly (zero-copy for Arrow-backed columns)
+            try:
+                return pa.array(series, type=pa.string(), from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                pass
+        return pa.array(series.astype(str), type=pa.string())
+    return series.astype(str)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def text_buffers(data: pd.DataFrame) -> dict:
+    """Per-dataset store of as_text_column buffers, filled lazily as columns are searched."""
+    return {}
+
+def contains_mask(column, needle: str) -> np.ndarray:
+    """Case-insensitive literal substring mask over an as_text_column buffer."""
+    if PYARROW_AVAILABLE:
+        # Null cells never match
+        return np.asarray(pc.match_substring(column, needle, ignore_case=True).fill_null(False))
+    return column.str.contains(needle, case=False, na=False, regex=False).to_numpy()
+
+@lru_cache(maxsize=32)
+def word_union_pattern(words: tuple) -> re.Pattern:
+    """Case-insensitive alternation of literal words, compiled once per word set."""
+    return re.compile("|".join(re.escape(word) for word in words), re.IGNORECASE)
+
+def contains_any_mask(column, pattern: re.Pattern) -> np.ndarray:
+    """Mask of rows matching a word_union_pattern, in one scan."""
+    if PYARROW_AVAILABLE:
+        return np.asarray(pc.match_substring_regex(column, pattern.pattern, ignore_case=True).fill_null(False))
+    return column.str.contains(pattern, na=False, regex=True).to_numpy()
+
+# Operators with a Numba threshold kernel
+THRESHOLD_OPS = ('>', '<', '>=', '<=')
+COMPARISON_OPS = {
+    '>': operator.gt, '<': operator.lt, '>=': operator.ge,
+    '<=': operator.le, '==': operator.eq, '!=': operator.ne,
+}
+# Below this size the JIT dispatch overhead outweighs the fused loop
+NUMBA_MIN_ROWS = 100_000
+
+@st.cache_resource(show_spinner=False)
+def _threshold_kernels() -> dict:
+    """One compiled kernel per operator, so the hot loop carries no operator branch.
+
+    Held with st.cache_resource because this script is re-executed on every rerun.
+    """
+    from numba import njit
+
+    # With parallel=True each array expression becomes one fused multithreaded loop
+    @njit(cache=True, parallel=True)
+    def greater(values, threshold):
+        return values > threshold
+
+    @njit(cache=True, parallel=True)
+    def less(values, threshold):
+        return values < threshold
+
+    @njit(cache=True, parallel=True)
+    def greater_equal(values, threshold):
+        return values >= threshold
+
+    @njit(cache=True, parallel=True)
+    def less_equal(values, threshold):
+        return values <= threshold
+
+    return {'>': greater, '<': less, '>=': greater_equal, '<=': less_equal}
+
+def threshold_mask(series: pd.Series, op: str, threshold: float):
+    """Boolean mask for `series <op> threshold`, fused into one native loop on large frames."""
+    if NUMBA_AVAILABLE and op in THRESHOLD_OPS and len(series) >= NUMBA_MIN_ROWS:
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return _threshold_kernels()[op](values, threshold)
+    return COMPARISON_OPS[op](series, threshold)
+
+def as_numeric(series: pd.Series) -> pd.Series:
+    """Numeric view of a column for comparisons; unparseable cells become NaN."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Parse each distinct label once and expand through the codes; code -1 (missing) hits the trailing NaN
+        labels = pd.to_numeric(series.cat.categories.astype(str), errors='coerce').to_numpy(dtype=np.float64)
+        return pd.Series(np.append(labels, np.nan)[series.cat.codes.to_numpy()], index=series.index)
+    # No astype(str) round-trip: to_numeric coerces object and Arrow strings directly
+    try:
+        return pd.to_numeric(series, errors='coerce')
+    except TypeError:
+        # Cells holding lists or dicts are rejected even with errors='coerce'
+        return pd.to_numeric(series.astype(str), errors='coerce')
+
+@lru_cache(maxsize=32)
+def comparison_matcher(columns: tuple) -> tuple[re.Pattern, dict]:
+    """Compile one `<column> <op> <number>` regex over all column names of a frame,
+    plus the map from a matched lower-cased name back to its column."""
+    col_map = {}
+    for c in columns:
+        # First column wins when two names differ only in case
+        col_map.setdefault(str(c).lower(), c)
+    # Longest names first so "price_usd" wins over "price"
+    names = sorted((re.escape(name) for name in col_map), key=len, reverse=True)
+    return re.compile(rf'(?<!\w)({"|".join(names)})\s*(>=|<=|==|!=|>|<)\s*(\d+\.?\d*)'), col_map
+
 def optimized_pattern_matching(data: pd.DataFrame, query: str) -> Optional[pd.DataFrame]:
     """Fast pattern matching for common queries - much faster than AI."""
     query_lower = query.lower()
     
     # Fast numeric filtering
     if any(op in query_lower for op in ['>', '<', '>=', '<=', '==', '!=']):
-        for col in data.columns:
-            if pd.api.types.is_numeric_dtype(data[col]) or col.lower() in query_lower:
-                # Extract numeric comparisons
-                import re
-                patterns = [
-                    (r'(\w+)\s*>\s*(\d+\.?\d*)', lambda m: data[data[m.group(1)] > float(m.group(2))]),
-                    (r'(\w+)\s*<\s*(\d+\.?\d*)', lambda m: data[data[m.group(1)] < float(m.group(2))]),
-                    (r'(\w+)\s*>=\s*(\d+\.?\d*)', lambda m: data[data[m.group(1)] >= float(m.group(2))]),
-                    (r'(\w+)\s*<=\s*(\d+\.?\d*)', lambda m: data[data[m.group(1)] <= float(m.group(2))]),
-                ]
+        pattern, col_map = comparison_matcher(tuple(data.columns))
+        match = pattern.search(query_lower)
+        if match:
+            try:
+                col_name = col_map[match.group(1)]
+                # Convert to numeric if needed, without touching the caller's frame
+                values = as_numeric(data[col_name])
                 
-                for pattern, func in patterns:
-                    match = re.search(pattern, query_lower)
-                    if match and match.group(1) in [c.lower() for c in data.columns]:
-                        col_name = next(c for c in data.columns if c.lower() == match.group(1))
-                        try:
-                            # Convert to numeric if needed
-                            if data[col_name].dtype == 'object':
-                                data[col_name] = pd.to_numeric(data[col_name], errors='coerce')
-                            
-                            if '>' in query_lower:
-                                return data[data[col_name] > float(match.group(2))]
-                            elif '<' in query_lower:
-                                return data[data[col_name] < float(match.group(2))]
-                            elif '>=' in query_lower:
-                                return data[data[col_name] >= float(match.group(2))]
-                            elif '<=' in query_lower:
-                                return data[data[col_name] <= float(match.group(2))]
-                        except:
-                            continue
+                return data[threshold_mask(values, match.group(2), float(match.group(3)))]
+            except Exception:
+                pass
     
     # Fast text filtering
     if any(word in query_lower for word in ['contains', 'like', 'has', 'with']):
-        for col in data.columns:
-            if data[col].dtype == 'object':
-                try:
-                    words = query_lower.split()
-                    for word in words:
-                        if len(word) > 3:  # Skip short words
-                            matches = data[data[col].astype(str).str.contains(word, case=False, na=False)]
-                            if not matches.empty:
-                                return matches
-                except:
+        # Skip short words; repeated words would only rescan the same column
+        words = list(dict.fromkeys(word for word in query_lower.split() if len(word) > 3))
+        text_columns = data.select_dtypes(include=TEXT_DTYPES).columns if words else []
+        buffers = text_buffers(data) if words else {}
+        any_word = word_union_pattern(tuple(words)) if words else None
+        for col in text_columns:
+            try:
+                # Convert each column once per dataset and only assemble a result frame on a hit
+                if col not in buffers:
+                    buffers[col] = as_text_column(data[col])
+                text = buffers[col]
+                # One alternation scan rules out columns where no word occurs
+                if not contains_any_mask(text, any_word).any():
                     continue
+                for word in words:
+                    mask = contains_mask(text, word)
+                    if mask.any():
+                        return data[mask]
+            except Exception:
+                continue
     
     # Fast counting
     if any(word in query_lower for word in ['count', 'how many']):
@@ -682,53 +1061,120 @@ def query_gemini_simple(query: str) -> Optional[str]:
         return None
         return None
 
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_search_service(api_key):
+    """Build the Custom Search client once per key, from the bundled discovery document."""
+    # st.cache_resource rather than lru_cache: Streamlit re-executes this script on every
+    # rerun, so a module-level cache here would be rebuilt each time
+    from googleapiclient.discovery import build
+    return build("customsearch", "v1", developerKey=api_key, cache_discovery=False, static_discovery=True)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def search_web_results(query, api_key, search_engine_id):
+    """Custom Search results for a query; reruns and repeat queries reuse them for an hour."""
+    res = get_search_service(api_key).cse().list(q=query, cx=search_engine_id).execute()
+    
+    search_results = []
+    for item in res.get('items', []):
+        search_results.append({
+            'title': item['title'],
+            'link': item['link'],
+            'snippet': item['snippet']
+        })
+    return search_results
+
+def search_results_markdown(results):
+    """All search results as one markdown block, so they render as a single element."""
+    return "\n\n".join(
+        f"**{item['title']}**: [Link]({item['link']})\n\n{item['snippet']}" for item in results
+    )
+
 def web_search(query):
     try:
-        service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY)
-        res = service.cse().list(q=query, cx=SEARCH_ENGINE_ID).execute()
-        
-        if 'items' in res:
-            search_results = []
-            for item in res['items']:
-                search_results.append({
-                    'title': item['title'],
-                    'link': item['link'],
-                    'snippet': item['snippet']
-                })
-            return search_results
-        return None
+        return search_web_results(query, GOOGLE_API_KEY, SEARCH_ENGINE_ID) or None
     
     except Exception as e:
         st.error(f"Error during web search: {e}")
         return None
 
+def chart_kind(query):
+    """Visualization type implied by the query's keywords."""
+    query_lower = query.lower()
+    if any(word in query_lower for word in ['trend', 'over time', 'timeline', 'time series']):
+        return 'time_series'
+    elif any(word in query_lower for word in ['distribution', 'histogram', 'frequency']):
+        return 'distribution'
+    elif any(word in query_lower for word in ['compare', 'comparison', 'vs', 'versus']):
+        return 'comparison'
+    elif any(word in query_lower for word in ['correlation', 'relationship', 'scatter']):
+        return 'correlation'
+    elif any(word in query_lower for word in ['count', 'total', 'sum', 'aggregate']):
+        return 'summary'
+    # Default: smart auto-detection based on data types
+    return 'auto'
+
 def generate_smart_visualizations(data, query, result_data):
     """Generate intelligent visualizations based on query intent and data"""
-    query_lower = query.lower()
-    
     try:
-        # Determine visualization type based on query keywords
-        if any(word in query_lower for word in ['trend', 'over time', 'timeline', 'time series']):
-            return create_time_series_chart(result_data)
-        elif any(word in query_lower for word in ['distribution', 'histogram', 'frequency']):
-            return create_distribution_chart(result_data)
-        elif any(word in query_lower for word in ['compare', 'comparison', 'vs', 'versus']):
-            return create_comparison_chart(result_data)
-        elif any(word in query_lower for word in ['correlation', 'relationship', 'scatter']):
-            return create_correlation_chart(result_data)
-        elif any(word in query_lower for word in ['count', 'total', 'sum', 'aggregate']):
-            return create_summary_chart(result_data)
-        else:
-            # Default: smart auto-detection based on data types
-            return create_auto_chart(result_data)
+        figure_json = chart_json(chart_kind(query), result_data)
+        if not figure_json:
+            return None
+        # Plotly is imported on first chart rather than at app startup
+        import plotly.io as pio
+        return pio.from_json(figure_json)
     except Exception as e:
         st.warning(f"Could not generate visualization: {e}")
         return None
 
-def create_time_series_chart(data):
+# Above these sizes charts are built from a summary of the rows instead of every row
+# (histograms are always pre-binned; large ones get a fixed HISTOGRAM_BINS)
+HISTOGRAM_PREBIN_ROWS = 50_000
+HISTOGRAM_BINS = 50
+SCATTER_SAMPLE_ROWS = 20_000
+SUMMARY_MAX_ROWS = 20
+TOP_CATEGORIES = 20
+
+class ColumnKinds(NamedTuple):
+    """Column names of a frame grouped by the dtype families the charts use."""
+    numeric: tuple
+    datetime: tuple
+    text: tuple
+
+def dtype_kind(dtype) -> Optional[str]:
+    """'numeric', 'datetime' or 'text' for a column dtype, matching the select_dtypes groups the charts used."""
+    if dtype == object or isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype)):
+        return 'text'
+    if pd.api.types.is_bool_dtype(dtype):
+        # select_dtypes('number') leaves booleans out
+        return None
+    if pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_timedelta64_dtype(dtype):
+        return 'numeric'
+    if isinstance(dtype, np.dtype) and dtype.kind == 'M':
+        # tz-naive only, like select_dtypes('datetime64')
+        return 'datetime'
+    return None
+
+def column_kinds(data: pd.DataFrame) -> ColumnKinds:
+    """Classify columns in one pass over the dtypes, testing each distinct dtype once."""
+    kinds = {'numeric': [], 'datetime': [], 'text': []}
+    kind_of = {}
+    for col, dtype in zip(data.columns, data.dtypes):
+        if dtype not in kind_of:
+            kind_of[dtype] = dtype_kind(dtype)
+        if kind_of[dtype] is not None:
+            kinds[kind_of[dtype]].append(col)
+    return ColumnKinds(
+        numeric=tuple(kinds['numeric']),
+        datetime=tuple(kinds['datetime']),
+        text=tuple(kinds['text']),
+    )
+
+def create_time_series_chart(data, kinds):
     """Create time series visualization"""
-    date_cols = data.select_dtypes(include=['datetime64']).columns
-    numeric_cols = data.select_dtypes(include=['number']).columns
+    import plotly.express as px
+    
+    date_cols = kinds.datetime
+    numeric_cols = kinds.numeric
     
     if len(date_cols) > 0 and len(numeric_cols) > 0:
         fig = px.line(data, x=date_cols[0], y=numeric_cols[0], 
@@ -736,76 +1182,133 @@ def create_time_series_chart(data):
         return fig
     return None
 
-def create_distribution_chart(data):
+def create_distribution_chart(data, kinds):
     """Create distribution histogram"""
-    numeric_cols = data.select_dtypes(include=['number']).columns
+    import plotly.express as px
+    
+    numeric_cols = kinds.numeric
     
     if len(numeric_cols) > 0:
+        series = data[numeric_cols[0]]
+        if pd.api.types.is_integer_dtype(series) or pd.api.types.is_float_dtype(series):
+            # Bin in NumPy's C loop and send one bar per bin instead of every value; small
+            # results use Sturges' rule, close to the bin count px.histogram would pick
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[np.isfinite(values)]
+            bins = HISTOGRAM_BINS if len(values) > HISTOGRAM_PREBIN_ROWS else 'sturges'
+            counts, edges = np.histogram(values, bins=bins)
+            fig = px.bar(x=(edges[:-1] + edges[1:]) / 2, y=counts,
+                         labels={'x': numeric_cols[0], 'y': 'count'},
+                         title=f"Distribution of {numeric_cols[0]}")
+            fig.update_traces(width=edges[1] - edges[0])
+            fig.update_layout(bargap=0)
+            return fig
         fig = px.histogram(data, x=numeric_cols[0], 
                           title=f"Distribution of {numeric_cols[0]}")
         return fig
     return None
 
-def create_comparison_chart(data):
+def create_comparison_chart(data, kinds):
     """Create comparison bar chart"""
-    categorical_cols = data.select_dtypes(include=['object', 'category']).columns
-    numeric_cols = data.select_dtypes(include=['number']).columns
+    import plotly.express as px
+    
+    categorical_cols = kinds.text
+    numeric_cols = kinds.numeric
     
     if len(categorical_cols) > 0 and len(numeric_cols) > 0:
-        fig = px.bar(data, x=categorical_cols[0], y=numeric_cols[0],
-                    title=f"{numeric_cols[0]} by {categorical_cols[0]}")
+        x, y = categorical_cols[0], numeric_cols[0]
+        # One bar per category (stacked rows rendered as their sum anyway), largest first;
+        # the long tail is cut so the payload scales with TOP_CATEGORIES, not cardinality
+        totals = data.groupby(x, observed=True, sort=False)[y].sum()
+        title = f"{y} by {x}"
+        if len(totals) > TOP_CATEGORIES:
+            title += f" (top {TOP_CATEGORIES} of {len(totals):,})"
+        totals = totals.nlargest(TOP_CATEGORIES)
+        fig = px.bar(totals.reset_index(), x=x, y=y, title=title,
+                     category_orders={x: totals.index.tolist()})
         return fig
     return None
 
-def create_correlation_chart(data):
+def create_correlation_chart(data, kinds):
     """Create scatter plot for correlation"""
-    numeric_cols = data.select_dtypes(include=['number']).columns
+    import plotly.express as px
+    
+    numeric_cols = kinds.numeric
     
     if len(numeric_cols) >= 2:
-        fig = px.scatter(data, x=numeric_cols[0], y=numeric_cols[1],
-                        title=f"Correlation: {numeric_cols[0]} vs {numeric_cols[1]}")
+        x, y = numeric_cols[0], numeric_cols[1]
+        title = f"Correlation: {x} vs {y}"
+        points = data[[x, y]]
+        if len(points) > SCATTER_SAMPLE_ROWS:
+            # A fixed seed keeps the sample, and so the cached figure, stable across reruns
+            points = points.sample(n=SCATTER_SAMPLE_ROWS, random_state=0)
+            title += f" (sample of {SCATTER_SAMPLE_ROWS:,} rows)"
+        # WebGL draws points on a canvas instead of one SVG node each
+        fig = px.scatter(points, x=x, y=y, render_mode='webgl', title=title)
         return fig
     return None
 
-def create_summary_chart(data):
+def create_summary_chart(data, kinds):
     """Create summary chart for aggregated data"""
-    if len(data) <= 20:  # Small dataset - show all values
-        categorical_cols = data.select_dtypes(include=['object', 'category']).columns
-        numeric_cols = data.select_dtypes(include=['number']).columns
-        
-        if len(categorical_cols) > 0 and len(numeric_cols) > 0:
-            fig = px.pie(data, names=categorical_cols[0], values=numeric_cols[0],
-                        title=f"Summary: {numeric_cols[0]} by {categorical_cols[0]}")
-            return fig
+    if len(data) > SUMMARY_MAX_ROWS:  # Only small results are shown as a pie
+        return None
+    import plotly.express as px
+    
+    categorical_cols = kinds.text
+    numeric_cols = kinds.numeric
+    
+    if len(categorical_cols) > 0 and len(numeric_cols) > 0:
+        fig = px.pie(data, names=categorical_cols[0], values=numeric_cols[0],
+                    title=f"Summary: {numeric_cols[0]} by {categorical_cols[0]}")
+        return fig
     return None
 
-def create_auto_chart(data):
+def create_auto_chart(data, kinds):
     """Automatically choose best chart type based on data"""
-    numeric_cols = data.select_dtypes(include=['number']).columns
-    categorical_cols = data.select_dtypes(include=['object', 'category']).columns
+    numeric_cols = kinds.numeric
+    categorical_cols = kinds.text
     
     # Priority: scatter for 2+ numeric, bar for 1 categorical + 1 numeric
     if len(numeric_cols) >= 2:
-        return create_correlation_chart(data)
+        return create_correlation_chart(data, kinds)
     elif len(categorical_cols) > 0 and len(numeric_cols) > 0:
-        return create_comparison_chart(data)
+        return create_comparison_chart(data, kinds)
     elif len(numeric_cols) > 0:
-        return create_distribution_chart(data)
+        return create_distribution_chart(data, kinds)
     
     return None
 
+CHART_BUILDERS = {
+    'time_series': create_time_series_chart,
+    'distribution': create_distribution_chart,
+    'comparison': create_comparison_chart,
+    'correlation': create_correlation_chart,
+    'summary': create_summary_chart,
+    'auto': create_auto_chart,
+}
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def chart_json(kind, result_data):
+    """Serialized figure for a result, so reruns skip rebuilding it from the data."""
+    if kind == 'summary' and len(result_data) > SUMMARY_MAX_ROWS:
+        # Would be rejected by create_summary_chart anyway; skip classifying the columns
+        return None
+    fig = CHART_BUILDERS[kind](result_data, column_kinds(result_data))
+    return fig.to_json() if fig is not None else None
+
 def query_gemini_ai(query: str, data: pd.DataFrame) -> Optional[str]:
     """Streamlined AI query processing."""
     try:
-        api_key = GEMINI_API_KEY or os.getenv("GEMINI_API_KEY")
+        # Resolved once at import by get_secret, which already falls back to the environment
+        api_key = GEMINI_API_KEY
         if not api_key:
             return "Gemini API key not configured"
             
         # Create focused prompt for faster processing
-        context = f"""Analyze this query for a dataset with {len(data)} rows and columns: {', '.join(data.columns[:10])}.
-Query: {query}
+        context = f"""Provide a concise analysis or filtering suggestion for the query below.
 
-Provide a concise analysis or filtering suggestion."""
+Dataset: {len(data)} rows; columns: {', '.join(map(str, data.columns[:10]))}.
+Query: {query}"""
         
         response = query_gemini(context, api_key)
         return response
@@ -823,24 +1326,13 @@ if __name__ == "__main__":
         )
         
         # Minimal clean styling
-        st.markdown("""
-        <style>
-        .main > div { padding-top: 1rem; }
-        .stAlert > div { border-radius: 10px; }
-        </style>
-        """, unsafe_allow_html=True)
+        st.markdown(APP_CSS, unsafe_allow_html=True)
         
         main()
         
         # Simple footer
         st.markdown("---")
-        st.markdown("""
-        <div style='text-align: center; padding: 1rem; color: #666;'>
-            🤖 AI Data Analytics Platform | 
-            <a href='https://github.com/ark5234/AI-Agent-Project' target='_blank'>GitHub</a> | 
-            <a href='https://ai-data-analytics-agent.streamlit.app/' target='_blank'>Live Demo</a>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(FOOTER_HTML, unsafe_allow_html=True)
         
     except Exception as e:
         st.error(f"Application Error: {str(e)}")